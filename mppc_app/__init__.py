@@ -13,7 +13,11 @@ args = parser.parse_args()
 # ---------------------------------------------------------------------------
 
 from flask import Flask
+from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import sqlite3
 import yaml
 
 app = Flask(__name__)
@@ -22,7 +26,23 @@ with open(args.conf_file_path, 'r') as file:
     config = yaml.safe_load(file)
 app.config.update(config)
 
-db = SQLAlchemy(app)
+# commit後の全インスタンス失効(expire)は属性アクセスごとの再SELECTを誘発する。
+# このアプリはcommit後にORMインスタンスを読み直さないため無効化する。
+db = SQLAlchemy(app, session_options={"expire_on_commit": False})
+
+# SQLiteではWALを有効化し、定期commit(書き込み)とプロットの読み出しが
+# 同じロックを奪い合わないようにする (PostgreSQL等の接続には何もしない)
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+# 変化の少ないエンドポイント応答用のインプロセスキャッシュ
+cache = Cache(app, config={"CACHE_TYPE": "SimpleCache"})
 from mppc_app.models import log, mppc_data
 
 # Blueprintの登録
@@ -13,11 +13,18 @@ args = parser.parse_args()
 
 import sys
 import serial
+import struct
 import time
 
-conv_factor_Vb = 1.812*10**-3
-conv_factor_volt = 1.812*10**-3
-conv_factor_curr = 4.980*10**-3
+from serial_protocol import FRAMES, reply_checksum
+
+conv_factor_Vb = 1.812e-3
+conv_factor_volt = 1.812e-3
+conv_factor_curr = 4.980e-3
+# temp conversion coefficients (kept as literals so 10**-n is not re-evaluated per call)
+conv_temp_gain   = 1.907e-5
+conv_temp_offset = 1.035
+conv_temp_slope  = -5.5e-3
 
 def hex2vol(hex_value):
     return int(hex_value, 16)*conv_factor_volt
@@ -26,14 +33,25 @@ def hex2curr(hex_value):
     return int(hex_value, 16)*conv_factor_curr
 
 def hex2temp(hex_value):
-    return ( int(hex_value, 16) * 1.907*10**-5 - 1.035 ) / (-5.5*10**-3)
+    return ( int(hex_value, 16) * conv_temp_gain - conv_temp_offset ) / conv_temp_slope
 
 def vol2hex(vol_value):
     # return hex( int(vol_value/conv_factor_Vb) )
     return format( int(vol_value/conv_factor_Vb), "04x" ).encode()
-    
+
+def read_response(ser, deadline=0.2):
+    # read eagerly until the 0x0D delimiter arrives instead of a fixed 100 ms sleep
+    buf = bytearray()
+    t_limit = time.monotonic() + deadline
+    while time.monotonic() < t_limit:
+        waiting = ser.in_waiting
+        buf.extend( ser.read(waiting if waiting else 1) )
+        if b"\x0D" in buf:
+            break
+    return bytes(buf)
+
 # open port
-ser = serial.Serial('/dev/ttyAMA{}'.format(args.uart_ch), baudrate=38400, parity='E', timeout=1)
+ser = serial.Serial('/dev/ttyAMA{}'.format(args.uart_ch), baudrate=38400, parity='E', timeout=0.02)
 
 print("\n------------------------------")
 if ser.isOpen():
@@ -43,13 +61,7 @@ else:
     sys.exit()
 
 # create command
-stx       = b"\x02"
-command   = "HPO".encode()
-etx       = b"\x03"
-check_sum = str( hex(sum(command)+5) )[-2:].encode()
-delimiter = b"\x0D"
-
-send_cmd = stx + command + etx + check_sum + delimiter
+send_cmd = FRAMES[b"HPO"]
 print("send command:     ", send_cmd)
 
 # send command
@@ -57,28 +69,29 @@ ser.write(send_cmd)
 ser.flush()
 
 # receive command and interpret it
-time.sleep(0.1)
-received_cmd = ser.readline()
+received_cmd = read_response(ser)
 print("received command: ", received_cmd)
 
 # close port
 ser.close()
 
-# cal checksum of received command
-cal_checksum = str( hex(sum(received_cmd[:-3])).upper() )[-2:]
-received_checksum = received_cmd[-3:-1].decode()
-print(f"checksum(cal/rec): {cal_checksum}, {received_checksum}")
+# cal checksum of received command (C-level format, no str/hex round trip)
+cal_checksum = reply_checksum(received_cmd)
+received_checksum = received_cmd[-3:-1]
+print(f"checksum(cal/rec): {cal_checksum.decode()}, {received_checksum.decode()}")
 print("------------------------------\n")
 
 # analyze received command
+# decode the 20 hex chars once and unpack status/reserved/volt/curr/temp in one C call
+status, _, volt_raw, curr_raw, temp_raw = struct.unpack( ">HHHHH", bytes.fromhex(received_cmd[4:24].decode()) )
+
 print("-- status --------------------")
-status = int(received_cmd.decode()[4:8], 16)
 for i in range(7):
     print(f"bit{i}: {(status >> i) & 1}")
 print("------------------------------\n")
 
 print("-- value ---------------------")
-print( "volt: {:.3f} [V]".format( hex2vol(received_cmd.decode()[12:16]) ) )
-print( "curr: {:.3f} [mA]".format( hex2curr(received_cmd.decode()[16:20]) ) )
-print( "temp: {:.3f} [deg]".format( hex2temp(received_cmd.decode()[20:24]) ) )
+print( "volt: {:.3f} [V]".format( volt_raw*conv_factor_volt ) )
+print( "curr: {:.3f} [mA]".format( curr_raw*conv_factor_curr ) )
+print( "temp: {:.3f} [deg]".format( ( temp_raw * conv_temp_gain - conv_temp_offset ) / conv_temp_slope ) )
 print("------------------------------\n")
@@ -1,78 +1,122 @@
 from mppc_app import app, db
 from mppc_app.models.log import Log
 
+from contextlib import ExitStack
+from datetime import datetime
 from functools import wraps
+from types import MappingProxyType
 import threading
-import time
 import numpy as np
 
-# フラグを管理するためのイベントオブジェクトを作成
-flag_module1 = threading.Event()
-flag_module2 = threading.Event()
-flag_module3 = threading.Event()
-flag_module4 = threading.Event()
-flag_modules = [ flag_module1, flag_module2, flag_module3, flag_module4 ]
+# モジュールごとの排他制御用ロックを作成
+lock_modules = [ threading.Lock() for _ in range(4) ]
+
+# モック値生成用の乱数生成器 (毎回生成するとseedingが支配的になるため共有する)
+rng = np.random.default_rng()
+
+# モックモニタ値の平均/幅 (行=モジュール1-4, 列=[hv, current, temp])
+_MON_LOC   = np.tile([50.0, 0.5, 20.0], (4, 1))
+_MON_SCALE = np.array([ [5.0+m, (m+1)/10, 5.0+m] for m in range(1, 5) ])
+
+# C11204ステータス(7bit)の全128通りについてフラグ辞書を事前計算しておく
+# (共有インスタンスを返すため、呼び出し側が書き換えられないようproxyで包む)
+_STATUS_FLAG_TABLE = [
+    MappingProxyType(dict(
+        hv_output      = (s >> 0) & 1,
+        over_curr_prot = (s >> 1) & 1,
+        over_curr      = (s >> 2) & 1,
+        with_temp_sens = (s >> 3) & 1,
+        over_temp      = (s >> 4) & 1,
+        temp_corr      = (s >> 6) & 1
+    ))
+    for s in range(128)
+]
+
+# ホットパス上のコマンド出力はDEBUG時のみ行う
+def debug_log(message):
+    if app.config.get("DEBUG"):
+        print(message)
 
 # デコレータの実装
 def flag_manager(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        flag = flag_modules[args[0]-1]
-        while flag.is_set():
-            time.sleep(0.1)
-        flag.set()
-        result = func(*args, **kwargs)
-        flag.clear()
-        return result
+        with lock_modules[args[0]-1]:
+            return func(*args, **kwargs)
     return wrapper
 
+# Logは1行ごとにcommitせず、キューに溜めて閾値/定期ジョブでまとめて書き込む
+_log_queue = []
+_log_queue_lock = threading.Lock()
+_LOG_FLUSH_THRESHOLD = 50
+
 def save_log(module_id, cmd_tx, cmd_rx, status):
-    with app.app_context():
-        data = Log(
-            module_id = module_id,
-            cmd_tx = cmd_tx,
-            cmd_rx = cmd_rx,
-            status = "success" if status else "failure"
-        )
-        db.session.add(data)
-        db.session.commit()
+    # 呼び出し元(リクエストハンドラ/scheduler job)が既にapp contextを持っているため、ここでは張らない
+    data = Log(
+        module_id = module_id,
+        cmd_tx = cmd_tx,
+        cmd_rx = cmd_rx,
+        status = "success" if status else "failure",
+        time = datetime.now()  # flush時ではなくコマンド実行時の時刻を記録する
+    )
+    with _log_queue_lock:
+        _log_queue.append(data)
+        need_flush = len(_log_queue) >= _LOG_FLUSH_THRESHOLD
+    if need_flush:
+        flush_log_queue()
+
+def flush_log_queue():
+    # 溜まったLog行を1トランザクションでまとめて書き込む
+    with _log_queue_lock:
+        batch = _log_queue[:]
+        _log_queue.clear()
+    if not batch:
+        return
+    db.session.bulk_save_objects(batch)
+    db.session.commit()
 
 @flag_manager
 def monitor(module_id, verbose = True):
     if verbose:
-        print("HPO")
-    rng = np.random.default_rng()
-    hv = rng.normal(50, 5+module_id)
-    current = rng.normal(0.5, (module_id+1)/10)
-    temp = rng.normal(20, 5+module_id)
-    
+        debug_log("HPO")
+    # 事前計算したパラメータを使って1回のベクトル化描画で生成する
+    hv, current, temp = rng.standard_normal(3) * _MON_SCALE[module_id-1] + _MON_LOC[module_id-1]
+
     return [hv, current, temp]
 
+def monitor_all(verbose = False):
+    # schedulerの1tick分のモニタ値(モジュール1-4)をまとめて取得する
+    # 実機ではHPOを全ポートへ連続送信して応答待ちを重ね合わせるため、
+    # ロックは1モジュールずつではなく最初に4つまとめて確保する
+    with ExitStack() as stack:
+        for lock in lock_modules:
+            stack.enter_context(lock)
+        if verbose:
+            debug_log("HPO")
+        # 4モジュール分を1回の(4,3)描画でまとめて生成する
+        return (rng.standard_normal((4, 3)) * _MON_SCALE + _MON_LOC).tolist()
+
 @flag_manager
 def get_hv(module_id):
-    rng = np.random.default_rng()
     hv = rng.normal(50, 5+module_id)
-    
+
     return hv
 
 @flag_manager
 def get_current(module_id):
-    rng = np.random.default_rng()
     current = rng.normal(0.5, (module_id+1)/10)
-    
+
     return current
 
 @flag_manager
 def get_temp(module_id):
-    rng = np.random.default_rng()
     temp = rng.normal(20, 5+module_id)
-    
+
     return temp
 
 @flag_manager
 def set_hv(module_id, hv):
-    rng  = np.random.default_rng()
-    print("HBV")
+    debug_log("HBV")
     is_success = False
     if rng.random() > 0.5:
         is_success = True
@@ -81,20 +125,18 @@ def set_hv(module_id, hv):
 
 @flag_manager
 def set_temp_corr(module_id, v0, t0, delta_t_h, delta_t_h_prime, delta_t_l, delta_t_l_prime):
-    rng  = np.random.default_rng()
-    print("HST")
+    debug_log("HST")
     is_success = False
     if rng.random() > 0.5:
         is_success = True
     save_log(module_id=module_id, cmd_tx="HST{}".format(v0), cmd_rx="hst", status=is_success)
-    print("HRT")
+    debug_log("HRT")
     save_log(module_id=module_id, cmd_tx="HRT", cmd_rx="hrt", status=is_success)
     return is_success
 
 @flag_manager
 def turn_on(module_id):
-    print("HON")
-    rng = np.random.default_rng()
+    debug_log("HON")
     is_success = False
     if rng.random() > 0.5:
         is_success = True
@@ -103,8 +145,7 @@ def turn_on(module_id):
 
 @flag_manager
 def turn_off(module_id):
-    print("HOF")
-    rng = np.random.default_rng()
+    debug_log("HOF")
     is_success = False
     if rng.random() > 0.5:
         is_success = True
@@ -113,8 +154,7 @@ def turn_off(module_id):
 
 @flag_manager
 def reset(module_id):
-    print("HRE")
-    rng = np.random.default_rng()
+    debug_log("HRE")
     is_success = False
     if rng.random() > 0.5:
         is_success = True
@@ -123,14 +163,6 @@ def reset(module_id):
 
 @flag_manager
 def get_status(module_id):
-    print("HGS")
-    cmd_rx = "44"
-    status = dict(
-        hv_output = 1,
-        over_curr_prot = 0,
-        over_curr = 0,
-        with_temp_sens = 0,
-        over_temp = 0,
-        temp_corr = 0
-    )
-    return status
\ No newline at end of file
+    debug_log("HGS")
+    cmd_rx = "01"
+    return _STATUS_FLAG_TABLE[int(cmd_rx, 16) & 0x7F]
\ No newline at end of file
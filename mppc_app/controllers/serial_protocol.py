@@ -0,0 +1,39 @@
+# C11204-01シリアルプロトコルのフレーム組み立てヘルパ
+# (monitor.py / ser_comm.py / set_vol.py から共通で使う)
+
+from functools import lru_cache
+
+STX       = b"\x02"
+ETX       = b"\x03"
+DELIMITER = b"\x0D"
+
+# ASCII16進用ルックアップテーブル (str/hex()経由の小さなオブジェクト生成を避ける)
+_HEX = b"0123456789abcdef"
+
+# HV値のDAC変換係数 [V/LSB]
+CONV_FACTOR_VB = 1.812e-3
+
+@lru_cache(maxsize=256)
+def vol2hex(vol_value):
+    # HBVペイロード用のASCII16進4桁 (同じsetpointの再エンコードはキャッシュが返す)
+    return format( int(vol_value/CONV_FACTOR_VB), "04x" ).encode()
+
+def checksum(command):
+    # STX + command + ETX のバイト和の下位1バイトをASCII16進2桁で返す
+    s = (sum(command) + 5) & 0xFF
+    return bytes(( _HEX[s >> 4], _HEX[s & 0xF] ))
+
+def pack(command):
+    # 送信フレーム STX + command + ETX + checksum + CR を組み立てる
+    return b"".join(( STX, command, ETX, checksum(command), DELIMITER ))
+
+def reply_checksum(frame):
+    # 受信フレームのchecksumを計算する (C-levelのbytesフォーマット、大文字16進2桁)
+    return b"%02X" % ( sum(frame[:-3]) & 0xFF )
+
+def verify(frame):
+    # 受信フレームのchecksumを照合する (bytes同士の比較でdecodeしない)
+    return len(frame) > 3 and reply_checksum(frame) == frame[-3:-1].upper()
+
+# 固定コマンドのフレームは内容が変わらないのでimport時に組み立てておく
+FRAMES = { cmd: pack(cmd) for cmd in (b"HPO", b"HON", b"HOF", b"HRE", b"HGS") }
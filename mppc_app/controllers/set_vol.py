@@ -16,6 +16,8 @@ import sys
 import serial
 import time
 
+from serial_protocol import pack, reply_checksum, verify, vol2hex
+
 conv_factor_Vb = 1.812*10**-3
 conv_factor_volt = 1.812*10**-3
 conv_factor_curr = 4.980*10**-3
@@ -26,12 +28,19 @@ def conv_temp(digit):
 def hex2vol(hex_value):
     return int(hex_value, 16)*conv_factor_Vb
 
-def vol2hex(vol_value):
-    # return hex( int(vol_value/conv_factor_Vb) )
-    return format( int(vol_value/conv_factor_Vb), "04x" ).encode()
-    
+def read_response(ser, deadline=0.2):
+    # read eagerly until the 0x0D delimiter arrives instead of a fixed 100 ms sleep
+    buf = bytearray()
+    t_limit = time.monotonic() + deadline
+    while time.monotonic() < t_limit:
+        waiting = ser.in_waiting
+        buf.extend( ser.read(waiting if waiting else 1) )
+        if b"\x0D" in buf:
+            break
+    return bytes(buf)
+
 # open port
-ser = serial.Serial('/dev/ttyAMA{}'.format(args.uart_ch), baudrate=38400, parity='E', timeout=1)
+ser = serial.Serial('/dev/ttyAMA{}'.format(args.uart_ch), baudrate=38400, parity='E', timeout=0.02)
 
 print("\n------------------------------")
 if ser.isOpen():
@@ -41,13 +50,7 @@ else:
     sys.exit()
 
 # create command
-stx       = b"\x02"
-command   = "HBV".encode() + vol2hex(args.vol)
-etx       = b"\x03"
-check_sum = str( hex(sum(command)+5) )[-2:].encode()
-delimiter = b"\x0D"
-
-send_cmd = stx + command + etx + check_sum + delimiter
+send_cmd = pack( "HBV".encode() + vol2hex(args.vol) )
 print("send command:     ", send_cmd)
 
 # send command
@@ -55,15 +58,19 @@ ser.write(send_cmd)
 ser.flush()
 
 # receive command and interpret it
-time.sleep(0.1)
-received_cmd = ser.readline()
+received_cmd = read_response(ser)
 print("received command: ", received_cmd)
 
-# cal checksum of received command
-cal_checksum = str( hex(sum(received_cmd[:-3])).upper() )[-2:]
-received_checksum = received_cmd[-3:-1].decode()
-print("checksum(cal/rec): {}, {}".format(cal_checksum, received_checksum))
+# cal checksum of received command (C-level format, no str/hex round trip)
+cal_checksum = reply_checksum(received_cmd)
+received_checksum = received_cmd[-3:-1]
+print("checksum(cal/rec): {}, {}".format(cal_checksum.decode(), received_checksum.decode()))
 print("------------------------------\n")
-    
+
 # close port
 ser.close()
+
+# judge success by the received checksum, not by the port-open status
+if not verify(received_cmd):
+    print("Error: checksum mismatch, HBV transaction failed")
+    sys.exit(1)
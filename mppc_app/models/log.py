@@ -3,6 +3,8 @@ from datetime import datetime
 
 class Log(db.Model):
     __tablename__ = 'log'
+    # per-module "latest N" queries stay index-covered as the table grows
+    __table_args__ = (db.Index('ix_log_module_id_id', 'module_id', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
     module_id = db.Column(db.Integer)
     cmd_tx = db.Column(db.String(255))
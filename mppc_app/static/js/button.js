@@ -1,24 +1,30 @@
+// Render log entries into the table (also called from the dashboard poll in plot.js)
+function fillLogTable(logs) {
+    // Clear the tbody of the table
+    $('#log-table tbody').empty();
+    // Add results to the table
+    $.each(logs, function(index, log) {
+        var row = $('<tr>');
+        row.append($('<td>').text(log.time));
+        row.append($('<td>').text(log.moduleId));
+        row.append($('<td>').text(log.cmd_tx));
+        row.append($('<td>').text(log.cmd_rx));
+        row.append($('<td>').addClass(log.status).text(log.status));
+        $('#log-table tbody').append(row);
+    });
+}
+
+// Used after commands, when only the log table needs a refresh
 function fetchLogDataAndFillTable() {
     $.getJSON('/_fetch_log', function(data) {
-        // Clear the tbody of the table
-        $('#log-table tbody').empty();
-        // Add results to the table
-        $.each(data.logs, function(index, log) {
-            var row = $('<tr>');
-            row.append($('<td>').text(log.time));
-            row.append($('<td>').text(log.moduleId));
-            row.append($('<td>').text(log.cmd_tx));
-            row.append($('<td>').text(log.cmd_rx));
-            row.append($('<td>').addClass(log.status).text(log.status));
-            $('#log-table tbody').append(row);
-        });
+        fillLogTable(data.logs);
     }).fail(function() {
         alert('Failed to fetch data');
     });
 }
 
 $(document).ready(function() {
-    fetchLogDataAndFillTable();
+    // The initial log fill comes with the dashboard poll in plot.js
 
     // Initialize switch states
     $('.switch').each(function() {
@@ -19,9 +19,10 @@ function createTrace(x, y, xaxis, yaxis, color, group, label) {
     };
 }
 
-// Fetch data and plot the graph and table
-function fetchMppcDataAndPlot() {
-    $.getJSON('/_fetch_mppc_data', function (data) {
+// Fetch plot data and logs in one request, then render graph, table and log table
+function fetchDashboardAndRender() {
+    $.getJSON('/_fetch_dashboard', function (dashboard) {
+        const data = dashboard.plot;
         // Generate traces for the plot
         const traces = [];
         const modules = ['Module1', 'Module2', 'Module3', 'Module4'];
@@ -112,16 +113,19 @@ function fetchMppcDataAndPlot() {
                 scale: 1
             }
         });
+
+        // Fill the log table from the same response (fillLogTable is in button.js)
+        fillLogTable(dashboard.logs);
     });
 }
 
 // Execute on page load
 $(document).ready(function () {
-    fetchMppcDataAndPlot();
+    fetchDashboardAndRender();
 
     // Fetch interval time and set auto-refresh
     $.getJSON('/_get_interval_time', function (data) {
         const intervalTime = data.intervalTime * 1000;
-        setInterval(fetchMppcDataAndPlot, intervalTime);
+        setInterval(fetchDashboardAndRender, intervalTime);
     });
 });
@@ -1,79 +1,190 @@
 from flask import Blueprint, request, jsonify
-from mppc_app import app, db
-from mppc_app.controllers.serial_comm import monitor, get_status, set_hv, set_temp_corr, turn_on, turn_off, reset
+from sqlalchemy import func
+from mppc_app import app, cache, db
+from mppc_app.controllers.serial_comm import monitor_all, flush_log_queue, get_status, set_hv, set_temp_corr, turn_on, turn_off, reset
 from mppc_app.models.log import Log
 from mppc_app.models.mppc_data import MPPC_data
+from mppc_app.views.index import _param_data
 action_bp = Blueprint('action', __name__)
 
 from apscheduler.schedulers.background import BackgroundScheduler
+import atexit
+import csv
+import io
+import threading
 import numpy as np
 from datetime import datetime
 
+# orjson serializes NumPy arrays natively; fall back to jsonify without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Buffer monitor samples and flush them as one multi-row transaction
+_mppc_buffer = []
+_mppc_buffer_lock = threading.Lock()
+_MPPC_FLUSH_THRESHOLD = 12
+
 # Function to save MPPC data
 def save_mppc_data():
+    # Monitor all 4 modules in one batched call
+    hv, curr, temp = zip(*monitor_all())
+    # Buffer the sample; the DB is only touched when the buffer flushes
+    row = dict(
+        hv1=hv[0], temp1=temp[0], curr1=curr[0],
+        hv2=hv[1], temp2=temp[1], curr2=curr[1],
+        hv3=hv[2], temp3=temp[2], curr3=curr[2],
+        hv4=hv[3], temp4=temp[3], curr4=curr[3],
+        time=datetime.now()
+    )
+    with _mppc_buffer_lock:
+        _mppc_buffer.append(row)
+        need_flush = len(_mppc_buffer) >= _MPPC_FLUSH_THRESHOLD
+    if need_flush:
+        flush_mppc_data()
+
+_MPPC_COLUMNS = (
+    "time",
+    "hv1", "temp1", "curr1",
+    "hv2", "temp2", "curr2",
+    "hv3", "temp3", "curr3",
+    "hv4", "temp4", "curr4"
+)
+
+# Flush buffered MPPC samples in one transaction
+def flush_mppc_data():
+    with _mppc_buffer_lock:
+        batch = _mppc_buffer[:]
+        _mppc_buffer.clear()
+    if not batch:
+        return
     with app.app_context():
-        # Initialize lists for HV, current, and temperature
-        hv, curr, temp = [], [], []
-        # Loop through 4 modules
-        for i in range(4):
-            # Monitor values for each module
-            monitor_values = monitor(i, verbose=False)
-            hv.append(monitor_values[0])
-            curr.append(monitor_values[1])
-            temp.append(monitor_values[2])
-        # Create MPPC_data object and commit to the database
-        data = MPPC_data(
-            hv1=hv[0], temp1=temp[0], curr1=curr[0],
-            hv2=hv[1], temp2=temp[1], curr2=curr[1],
-            hv3=hv[2], temp3=temp[2], curr3=curr[2],
-            hv4=hv[3], temp4=temp[3], curr4=curr[3],
-        )
-        db.session.add(data)
+        # MPPC_data lives on its own bind; resolve that engine, not the default one
+        engine = db.session.get_bind(MPPC_data.__mapper__)
+        if engine.dialect.name == "postgresql":
+            # COPY skips per-row INSERT overhead on large batches
+            buf = io.StringIO()
+            csv.writer(buf, delimiter="\t").writerows(
+                [tuple(row[col] for col in _MPPC_COLUMNS) for row in batch]
+            )
+            buf.seek(0)
+            raw = db.session.connection(bind_arguments={"mapper": MPPC_data.__mapper__}).connection
+            with raw.cursor() as cur:
+                cur.copy_from(buf, MPPC_data.__tablename__, columns=_MPPC_COLUMNS, sep="\t")
+        else:
+            db.session.bulk_insert_mappings(MPPC_data, batch)
         db.session.commit()
 
+# Flush queued Log rows in one transaction
+def flush_log():
+    with app.app_context():
+        flush_log_queue()
+
 # Setup scheduler
+# coalesce/max_instances keep slow monitor cycles from stacking up:
+# missed runs collapse into one and a tick never starts while one is running
 scheduler = BackgroundScheduler()
-scheduler.add_job(save_mppc_data, 'interval', seconds=app.config["MONITORING_INTERVAL"])
+scheduler.add_job(save_mppc_data, 'interval', seconds=app.config["MONITORING_INTERVAL"],
+                  coalesce=True, max_instances=1)
+scheduler.add_job(flush_log, 'interval', seconds=2, coalesce=True, max_instances=1)
 scheduler.start()
 
-# get plot interval time
+# Make sure pending rows are not lost on shutdown
+atexit.register(flush_log)
+atexit.register(flush_mppc_data)
+
+# get plot interval time (config constant, effectively immutable at runtime)
 @action_bp.route("/_get_interval_time")
+@cache.cached(timeout=3600)
 def get_interval_time():
     return jsonify({"intervalTime": app.config["PLOT_INTERVAL"]})
 
-# fetch MPPC data
-@action_bp.route('/_fetch_mppc_data')
-def fetch_mppc_data():
-    # Query latest MPPC data
-    n = MPPC_data.query.count()
+# Cache key for fetch_mppc_data: the latest row id, so concurrent tabs
+# share one computed response and the key moves as soon as new data lands
+def _mppc_cache_key(*args, **kwargs):
+    # Write out buffered samples first so the key includes the newest tick
+    flush_mppc_data()
+    latest_id = db.session.query(func.max(MPPC_data.id)).scalar()
+    return f"mppc:{latest_id}"
+
+# Build the plot payload ("y" stays an ndarray; orjson encodes it natively)
+def _latest_mppc():
+    # Query only the needed columns (plain tuples, no ORM instance hydration)
+    cols = (
+        MPPC_data.time,
+        MPPC_data.hv1, MPPC_data.temp1, MPPC_data.curr1,
+        MPPC_data.hv2, MPPC_data.temp2, MPPC_data.curr2,
+        MPPC_data.hv3, MPPC_data.temp3, MPPC_data.curr3,
+        MPPC_data.hv4, MPPC_data.temp4, MPPC_data.curr4
+    )
     n_show = 100
-    latest_data = MPPC_data.query.offset(n - n_show).limit(n_show).all()
+    rows = db.session.query(*cols).order_by(MPPC_data.id.desc()).limit(n_show).all()[::-1]
     # Extract x and y values for plot
-    x = [data.time.isoformat() for data in latest_data]
+    x = [row[0].isoformat() for row in rows]
     curr_plot_factor = 10
-    y = np.array([
-        [
-            data.hv1, data.temp1, data.curr1 * curr_plot_factor,
-            data.hv2, data.temp2, data.curr2 * curr_plot_factor, 
-            data.hv3, data.temp3, data.curr3 * curr_plot_factor,
-            data.hv4, data.temp4, data.curr4 * curr_plot_factor
-        ] for data in latest_data
-    ]).T.tolist()
-    return jsonify({"x": x, "y": y})
+    y = np.asarray([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), 12)
+    y[:, 2::3] *= curr_plot_factor  # scale all current columns in one broadcast
+    y = np.ascontiguousarray(y.T)   # orjson needs a contiguous array
+    return {"x": x, "y": y}
+
+# Build the log-table payload (newest-first, as the table expects)
+def _latest_logs():
+    n_show = 30
+    latest_log = Log.query.order_by(Log.id.desc()).limit(n_show).all()
+    # isoformat here so jsonify serializes plain strings, not datetimes
+    return [dict(time=log.time.isoformat(), moduleId=log.module_id, cmd_tx=log.cmd_tx, cmd_rx=log.cmd_rx, status=log.status) for log in latest_log]
+
+# fetch MPPC data
+@action_bp.route('/_fetch_mppc_data')
+@cache.cached(timeout=app.config["PLOT_INTERVAL"], make_cache_key=_mppc_cache_key)
+def fetch_mppc_data():
+    payload = _latest_mppc()
+    if orjson is not None:
+        # encode the ndarray directly, skipping the tolist() float boxing
+        return app.response_class(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), mimetype="application/json")
+    payload["y"] = payload["y"].tolist()
+    return jsonify(payload)
 
 # fetch logs
 @action_bp.route('/_fetch_log')
 def fetch_log():
-    # Query latest logs
-    n = Log.query.count()
-    n_show = 30
-    latest_log = Log.query.offset(n - n_show).limit(n_show).all()[::-1]
-    # Prepare logs data
-    logs = [dict(time=log.time, moduleId=log.module_id, cmd_tx=log.cmd_tx, cmd_rx=log.cmd_rx, status=log.status) for log in latest_log]
-    return jsonify(logs=logs)
+    # Write out any queued log rows so the freshest commands are visible
+    flush_log_queue()
+    return jsonify(logs=_latest_logs())
+
+# Cache key for fetch_dashboard: latest row ids of both tables, so concurrent
+# tabs share one payload and the key moves when either a sample or a log lands
+def _dashboard_cache_key(*args, **kwargs):
+    # Write out buffered rows first so the key includes the newest tick
+    flush_mppc_data()
+    flush_log_queue()
+    latest_mppc_id = db.session.query(func.max(MPPC_data.id)).scalar()
+    latest_log_id = db.session.query(func.max(Log.id)).scalar()
+    return f"dashboard:{latest_mppc_id}:{latest_log_id}"
 
-# get switch status
+# fetch plot data and logs together (the page polls both on the same cadence,
+# so one request replaces two dispatch/DB/JSON round-trips per tick)
+@action_bp.route('/_fetch_dashboard')
+@cache.cached(timeout=app.config["PLOT_INTERVAL"], make_cache_key=_dashboard_cache_key)
+def fetch_dashboard():
+    payload = {"plot": _latest_mppc(), "logs": _latest_logs()}
+    if orjson is not None:
+        return app.response_class(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), mimetype="application/json")
+    payload["plot"]["y"] = payload["plot"]["y"].tolist()
+    return jsonify(payload)
+
+# switch state/text pairs, precomputed per (switch type, flag value)
+_SWITCH_TABLE = {
+    ('HV',   False): ('off', 'HV OFF'),
+    ('HV',   True):  ('on',  'HV ON'),
+    ('Temp', False): ('off', 'Temp OFF'),
+    ('Temp', True):  ('on',  'Temp ON')
+}
+
+# get switch status (coalesce polls within 2 s into one serial transaction)
 @app.route('/_get_switch_status')
+@cache.cached(timeout=2, query_string=True)
 def get_switch_status():
     # Get module ID and switch type from request
     module_id = request.args.get('moduleId', type=int)
@@ -81,34 +192,35 @@ def get_switch_status():
 
     # Get status for the module
     status = get_status(module_id)
-    initial_state = 'off'
-    initial_text = switch_type + ' OFF'
-    if switch_type == "HV":
-        if status["hv_output"]:
-            initial_state = 'on'
-            initial_text = switch_type + ' ON'
-    elif switch_type == "Temp":
-        if status["temp_corr"]:
-            initial_state = 'on'
-            initial_text = switch_type + ' ON'
-
-    return jsonify({'state': initial_state, 'text': initial_text})
+    flag = status["hv_output"] if switch_type == "HV" else status["temp_corr"]
+    state, text = _SWITCH_TABLE[(switch_type, bool(flag))]
+
+    return jsonify({'state': state, 'text': text})
+
+# command dispatch table (single dict lookup instead of string compares)
+_CMD_HANDLERS = {
+    "on": turn_on,
+    "off": turn_off,
+    "reset": reset,
+}
 
 # send command to module
 @action_bp.route('/_send_cmd')
 def send_cmd():
     module_id = request.args.get('moduleId', type=int)
     cmd_type = request.args.get('cmdType', type=str)
-    is_success = False
-    if cmd_type == "on":
-        is_success = turn_on(module_id)
-    elif cmd_type == "off":
-        is_success = turn_off(module_id)
-    elif cmd_type == "reset":
-        is_success = reset(module_id)
+    handler = _CMD_HANDLERS.get(cmd_type)
+    is_success = handler(module_id) if handler is not None else False
+    if is_success:
+        # drop cached switch states so the UI sees the new state immediately
+        cache.clear()
 
     return jsonify({'isSuccess': is_success})
 
+# per-module config dicts, resolved once (they are mutated in place, so the
+# tuple keeps seeing V0 updates)
+_MODULES = tuple(app.config[f"MODULE{i}"] for i in (1, 2, 3, 4))
+
 # change HV value
 @action_bp.route('/_change_hv')
 def change_hv():
@@ -116,78 +228,49 @@ def change_hv():
     hv_value = request.args.get('hvValue', type=float)
     hv_type = request.args.get('hvType', type=str)
 
-    if hv_value < 0 or app.config[f"MODULE{module_id}"]["VMAX"] < hv_value:
+    mod = _MODULES[module_id-1]
+    if hv_value < 0 or mod["VMAX"] < hv_value:
         return jsonify({'statusCode': 2})  # out of range
     is_success = False
     if hv_type == "Norm":
         is_success = set_hv(module_id, hv_value)
     elif hv_type == "Temp":
-        app.config[f"MODULE{module_id}"]["V0"] = hv_value
+        mod["V0"] = hv_value
+        # the index page renders V0 from its cached param_data
+        _param_data.cache_clear()
         is_success = set_temp_corr(
             module_id,
             hv_value,
-            app.config[f"MODULE{module_id}"]["T0"],
-            app.config[f"MODULE{module_id}"]["DELTA_T_HIGH"],
-            app.config[f"MODULE{module_id}"]["DELTA_T_HIGH_PRIME"],
-            app.config[f"MODULE{module_id}"]["DELTA_T_LOW"],
-            app.config[f"MODULE{module_id}"]["DELTA_T_LOW_PRIME"]
+            mod["T0"],
+            mod["DELTA_T_HIGH"],
+            mod["DELTA_T_HIGH_PRIME"],
+            mod["DELTA_T_LOW"],
+            mod["DELTA_T_LOW_PRIME"]
         )
+    if is_success:
+        # drop cached switch states so the UI sees the new state immediately
+        cache.clear()
     return jsonify({'statusCode': 0 if is_success else 1})
 
+# status rows for check_status: (label, flag key, (off text, on text))
+_STATUS_FIELDS = (
+    ("HV Output",              "hv_output",      ("OFF", "ON")),
+    ("Overcurrent Protection", "over_curr_prot", ("Not Active", "Active")),
+    ("Current Value",          "over_curr",      ("Within Spec", "Out of Spec")),
+    ("Temp Sensor Connection", "with_temp_sens", ("Not Connected", "Connected")),
+    ("Temp Range",             "over_temp",      ("Within Spec", "Out of Spec")),
+    ("Temp Correction",        "temp_corr",      ("Disabled", "Enabled"))
+)
+
 # check module status
 @action_bp.route('/_check_status')
 def check_status():
     module_id = request.args.get('moduleId', type=int)
     status_dict = get_status(module_id)
-    detail_status = []
-    detail_status.append(
-        dict(
-            label="Time",
-            value=datetime.now(),
-            bit=None
-        )
-    )
-    detail_status.append(
-        dict(
-            label="HV Output",
-            value="ON" if status_dict["hv_output"] else "OFF",
-            bit=status_dict["hv_output"]
-        )
-    )
-    detail_status.append(
-        dict(
-            label="Overcurrent Protection",
-            value="Active" if status_dict["over_curr_prot"] else "Not Active",
-            bit=status_dict["over_curr_prot"]
-        )
-    )
-    detail_status.append(
-        dict(
-            label="Current Value",
-            value="Out of Spec" if status_dict["over_curr"] else "Within Spec",
-            bit=status_dict["over_curr"]
-        )
-    )
-    detail_status.append(
-        dict(
-            label="Temp Sensor Connection",
-            value="Connected" if status_dict["with_temp_sens"] else "Not Connected",
-            bit=status_dict["with_temp_sens"]
-        )
-    )
-    detail_status.append(
-        dict(
-            label="Temp Range",
-            value="Out of Spec" if status_dict["over_temp"] else "Within Spec",
-            bit=status_dict["over_temp"]
-        )
-    )
-    detail_status.append(
-        dict(
-            label="Temp Correction",
-            value="Enabled" if status_dict["temp_corr"] else "Disabled",
-            bit=status_dict["temp_corr"]
-        )
-    )
+    detail_status = [dict(label="Time", value=datetime.now().isoformat(timespec='seconds'), bit=None)]
+    detail_status += [
+        dict(label=label, value=texts[status_dict[key]], bit=status_dict[key])
+        for label, key, texts in _STATUS_FIELDS
+    ]
 
     return jsonify(detailStatus=detail_status)
\ No newline at end of file